@@ -5,14 +5,26 @@ Python parsers for bank statement PDFs.
 """
 # Imports
 import argparse
-import subprocess
+import ast
+import contextlib
 import sys
 import os
 import csv
+import functools
+import hashlib
+import importlib
 import importlib.util
+import io
+import itertools
+import re
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeoutError, as_completed
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Set, Tuple
+import fitz  # PyMuPDF
 import google.generativeai as genai
+import orjson
+import pytest
 from groq import Groq
 from dotenv import load_dotenv
 
@@ -20,7 +32,24 @@ from dotenv import load_dotenv
 
 load_dotenv()
 MAX_ATTEMPTS = 3
+MAX_BATCH_SIZE = 2
 PARSERS_DIR = Path("custom_parsers")
+PDF_SAMPLE_CHARS = 3000
+CSV_SAMPLE_ROWS = 3
+CANDIDATE_TEMPERATURE = 0.4
+EXPLORE_TEMPERATURE = 0.7
+EXPLORE_INSTRUCTION = (
+    "\nEarlier attempts at this parser kept failing with the same error. "
+    "Try a substantially different approach.\n"
+)
+# Fences may carry any language tag (```python, ```py, ```Python3, ...)
+_CODE_FENCE_RE = re.compile(r"```(?:[A-Za-z0-9_+-]*)\s*(.*?)\s*```", re.DOTALL)
+_FENCE_MARKER_RE = re.compile(r"```(?:[A-Za-z0-9_+-]*)")
+_DATE_PROBE_RE = re.compile(r"\b\d{1,2}[-/.]\d{1,2}[-/.]\d{2,4}\b|\b\d{1,2} [A-Za-z]{3,9} \d{4}\b")
+LAYOUT_SAMPLE_ROWS = 3
+MAX_FAILURE_CHARS = 2000
+CONTRACT_TEST_TIMEOUT_SECONDS = 120
+PREWARM_MODULES = ("fitz", "numpy", "pandas", "pytest")
 
 # --- API Initialization ---
 
@@ -39,6 +68,299 @@ def initialize_clients() -> Dict[str, Any]:
         "groq": Groq(api_key=groq_api_key),
     }
 
+# --- Sample Helpers ---
+
+# The sample files do not change during a run, so their contents are cached
+# on (path, mtime) and shared across every retry attempt.
+
+@functools.lru_cache(maxsize=4)
+def _read_pdf_text(pdf_path: str, mtime_ns: int, max_chars: int) -> str:
+    # Pages are read one at a time and only until the sample is full, so a
+    # long statement is never extracted just to be truncated
+    chunks, size = [], 0
+    with fitz.open(pdf_path) as doc:
+        for page in doc:
+            chunks.append(page.get_text("text"))
+            size += len(chunks[-1])
+            if size >= max_chars:
+                break
+    return "".join(chunks)[:max_chars]
+
+@functools.lru_cache(maxsize=4)
+def _read_csv_head(csv_path: str, mtime_ns: int) -> Tuple[str, ...]:
+    # Only the header and a few rows are ever needed, so stop reading there
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        return tuple(line.rstrip("\r\n") for line in itertools.islice(f, CSV_SAMPLE_ROWS + 1))
+
+def _locate_columns(
+    row: List[Tuple[float, float, str]], columns: Tuple[str, ...]
+) -> Optional[List[Tuple[float, float]]]:
+    # Finds each column name, in order, as a run of words in the row and
+    # returns the horizontal extent of each run
+    words = [word for _, _, word in row]
+    spans = []
+    position = 0
+    for column in columns:
+        tokens = column.split()
+        while position + len(tokens) <= len(words) and words[position:position + len(tokens)] != tokens:
+            position += 1
+        if position + len(tokens) > len(words):
+            return None
+        spans.append((row[position][0], row[position + len(tokens) - 1][1]))
+        position += len(tokens)
+    return spans
+
+@functools.lru_cache(maxsize=4)
+def _read_table_layout(pdf_path: str, mtime_ns: int, columns: Tuple[str, ...]) -> str:
+    with fitz.open(pdf_path) as doc:
+        if not doc.page_count:
+            return ""
+        page = doc[0]
+        words = page.get_text("words")
+        page_width = page.rect.width
+
+    # Words sharing a top edge form one visual row
+    rows: Dict[int, List[Tuple[float, float, str]]] = {}
+    for x0, y0, x1, y1, word, *_ in words:
+        rows.setdefault(round(y0), []).append((x0, x1, word))
+    ordered = [(y, sorted(rows[y])) for y in sorted(rows)]
+
+    for index, (header_y, row) in enumerate(ordered):
+        spans = _locate_columns(row, columns)
+        if spans:
+            break
+    else:
+        return ""
+
+    # Column boundaries sit halfway between neighbouring header labels
+    edges = [0.0]
+    edges += [(left[1] + right[0]) / 2 for left, right in zip(spans, spans[1:])]
+    edges.append(page_width)
+    bounds = {name: [round(edges[i], 1), round(edges[i + 1], 1)] for i, name in enumerate(columns)}
+
+    sample_rows = [row for _, row in ordered[index + 1:index + 1 + LAYOUT_SAMPLE_ROWS]]
+    date_match = _DATE_PROBE_RE.search(" ".join(word for row in sample_rows for _, _, word in row))
+
+    lines = [
+        f"Header row found on page 1 at y={header_y}.",
+        f"column_x_bounds = {bounds}",
+    ]
+    if date_match:
+        lines.append(f"Dates look like: {date_match.group(0)}")
+    lines.append("First rows as (x0, word) pairs:")
+    lines += [str([(round(x0, 1), word) for x0, _, word in row]) for row in sample_rows]
+    return "\n".join(lines)
+
+def extract_text_from_pdf(pdf_path: Path, max_chars: int) -> str:
+    """
+    Extracts the raw text of the first pages using PyMuPDF.
+
+    Args:
+        pdf_path: The path to the PDF file.
+        max_chars: Stop reading pages once this many characters have been
+            extracted.
+
+    Returns:
+        The first max_chars characters of the concatenated page text.
+    """
+    return _read_pdf_text(str(pdf_path), pdf_path.stat().st_mtime_ns, max_chars)
+
+def describe_table_layout(pdf_path: Path, columns: List[str]) -> str:
+    """
+    Probes the first page of a PDF for the statement table's geometry.
+
+    Locates the header row from the column names, derives an x-range for
+    each column and samples the first rows, so the generated parser can
+    assign words to columns directly instead of guessing delimiters.
+
+    Args:
+        pdf_path: The path to the PDF file.
+        columns: The expected column names, in order.
+
+    Returns:
+        A prompt-ready description of the layout, or "" if no header row
+        containing every column name was found.
+    """
+    return _read_table_layout(str(pdf_path), pdf_path.stat().st_mtime_ns, tuple(columns))
+
+def get_csv_header(csv_path: Path) -> List[str]:
+    """
+    Reads the column names from the first row of a CSV file.
+
+    Args:
+        csv_path: The path to the CSV file.
+
+    Returns:
+        The list of column names.
+    """
+    head = _read_csv_head(str(csv_path), csv_path.stat().st_mtime_ns)
+    return next(csv.reader(head[:1]), [])
+
+def _is_number(value: str) -> bool:
+    try:
+        float(value.replace(",", ""))
+    except ValueError:
+        return False
+    return True
+
+def get_csv_schema(csv_path: Path) -> str:
+    """
+    Describes the columns of a CSV file from its first few rows.
+
+    Args:
+        csv_path: The path to the CSV file.
+
+    Returns:
+        One "- name: type" line per column, followed by the raw sample rows.
+    """
+    head = _read_csv_head(str(csv_path), csv_path.stat().st_mtime_ns)
+    rows = list(csv.reader(head))
+    header, samples = (rows[0], rows[1:]) if rows else ([], [])
+
+    lines = []
+    for i, name in enumerate(header):
+        values = [row[i] if i < len(row) else "" for row in samples]
+        filled = [value for value in values if value.strip()]
+        if not filled:
+            kind = "empty in the sample rows"
+        else:
+            kind = "number" if all(_is_number(value) for value in filled) else "text"
+            if len(filled) < len(values):
+                kind += ", sometimes empty"
+        lines.append(f"- {name}: {kind}")
+    return "\n".join(lines + ["", "First rows:", *head])
+
+# --- Contract Testing ---
+
+# Durations, candidate module numbers and pytest temp dirs differ between
+# otherwise identical failures, so they are left out of the signature
+_VOLATILE_RE = re.compile(r"\d+(?:\.\d+)?s\b|_parser_\d+|pytest-\d+")
+
+def check_parser_structure(code: str) -> Optional[str]:
+    """
+    Cheaply checks that generated code could satisfy the parser contract.
+
+    Args:
+        code: The cleaned parser source code.
+
+    Returns:
+        A description of the problem, or None if the code looks usable.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        return f"SyntaxError: {e.msg} (line {e.lineno})"
+
+    definitions = [
+        node for node in tree.body
+        if isinstance(node, ast.FunctionDef) and node.name == "parse_pdf"
+    ]
+    if not definitions:
+        return "no top-level parse_pdf function defined"
+    # Only the last definition survives import, so any earlier ones are dead
+    # code that hides which implementation actually runs
+    if len(definitions) > 1:
+        return f"parse_pdf is defined {len(definitions)} times; keep a single implementation"
+
+    args = definitions[0].args
+    positional = args.posonlyargs + args.args
+    required = len(positional) - len(args.defaults)
+    takes_path = bool(positional) or args.vararg is not None
+    if required > 1 or not takes_path or None in args.kw_defaults:
+        return "parse_pdf must be callable with a single pdf_path argument"
+    return None
+
+def _prewarm_worker() -> None:
+    # Runs once per test worker so each contract test skips these imports
+    for module_name in PREWARM_MODULES:
+        with contextlib.suppress(ImportError):
+            importlib.import_module(module_name)
+
+def _code_digest(code: str) -> str:
+    return hashlib.blake2b(code.encode("utf-8"), digest_size=8).hexdigest()
+
+def _failure_signature(output: str) -> str:
+    return _code_digest(_VOLATILE_RE.sub("", output))
+
+class _FailureCollector:
+    """Pytest plugin that keeps a short summary of every failed report."""
+
+    def __init__(self) -> None:
+        self.failures: List[Dict[str, str]] = []
+
+    def _record(self, report: Any, when: str) -> None:
+        if report.failed:
+            # Parsers tend to catch their own exceptions and just print them,
+            # so the captured output is often the only place the cause shows up
+            output = "".join(content for title, content in report.sections if title.startswith("Captured"))
+            output = output[-(MAX_FAILURE_CHARS // 2):]
+            self.failures.append({
+                "nodeid": report.nodeid,
+                "when": when,
+                "message": report.longreprtext[-(MAX_FAILURE_CHARS - len(output)):],
+                "output": output,
+            })
+
+    def pytest_collectreport(self, report: Any) -> None:
+        self._record(report, "collect")
+
+    def pytest_runtest_logreport(self, report: Any) -> None:
+        self._record(report, report.when)
+
+def run_contract_test(bank_name: str, parser_module: str) -> bytes:
+    """
+    Runs the pytest contract test for one parser module in the current process.
+
+    Meant to run inside a worker process, which is reused across attempts.
+    Only a compact summary of the failures crosses back to the agent, never
+    pytest's full terminal output.
+
+    Args:
+        bank_name: The bank identifier whose test case should run.
+        parser_module: The dotted module name of the parser under test.
+
+    Returns:
+        The orjson-encoded result: {"ok", "exit_code", "failures"}.
+    """
+    # Make sure the freshly written candidate is imported, not a cached copy
+    sys.modules.pop(parser_module, None)
+    importlib.invalidate_caches()
+    os.environ["PARSER_MODULE"] = parser_module
+
+    collector = _FailureCollector()
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        exit_code = pytest.main([
+            f"tests/test_parser_contract.py::TestParserContract::test_parser_structure_and_output[{bank_name}]",
+            "-q", "--no-header", "-p", "no:cacheprovider",
+        ], plugins=[collector])
+    return orjson.dumps({
+        "ok": exit_code == pytest.ExitCode.OK,
+        "exit_code": int(exit_code),
+        "failures": collector.failures,
+    })
+
+def format_test_result(result: Dict[str, Any]) -> str:
+    """
+    Renders a decoded contract test result for display.
+
+    Args:
+        result: The decoded result returned by run_contract_test.
+
+    Returns:
+        A short human-readable report.
+    """
+    if result["ok"]:
+        return "✅ Contract test passed."
+    if not result["failures"]:
+        return f"❌ pytest exited with code {result['exit_code']}."
+    reports = []
+    for failure in result["failures"]:
+        report = f"❌ {failure['nodeid']} ({failure['when']})\n{failure['message']}"
+        if failure.get("output"):
+            report += f"\nCaptured output:\n{failure['output']}"
+        reports.append(report)
+    return "\n\n".join(reports)
+
 class ParserAgent:
     
     # An agent that generates and validates PDF parsing code for bank statements.
@@ -55,80 +377,175 @@ class ParserAgent:
         self.clients = initialize_clients()
         self.backend = self._select_backend(preferred_backend)
 
-        # Define file paths
-        self.pdf_path = Path(f"data/{self.bank_name}/{self.bank_name}_sample.pdf")
-        self.csv_path = Path(f"data/{self.bank_name}/{self.bank_name}_sample.csv")
+        # Define file paths, resolved once so later stat/open calls skip the lookup
+        samples_dir = Path("data", self.bank_name).resolve()
+        self.pdf_path = samples_dir / f"{self.bank_name}_sample.pdf"
+        self.csv_path = samples_dir / f"{self.bank_name}_sample.csv"
         self.parser_path = PARSERS_DIR / f"{self.bank_name}_parser.py"
 
+        # Worker processes for contract tests, created on first use
+        self._test_pool: Optional[ProcessPoolExecutor] = None
+
     def _select_backend(self, preferred: Optional[str]) -> str:
         """Selects the AI backend, defaulting to 'gemini'."""
         if preferred in ["gemini", "groq"]:
             return preferred
         return "gemini"
 
-    def _get_ai_response(self, prompt: str) -> str:
+    def _get_ai_responses(self, prompt: str, n: int, temperature: float) -> List[str]:
         """
-        Calls the selected AI model to get a response.
+        Calls the selected AI model to sample several responses in one request.
 
         Args:
             prompt: The prompt to send to the AI model.
+            n: The number of candidate responses to request.
+            temperature: The sampling temperature.
 
         Returns:
-            The text response from the AI.
+            The text of each candidate response.
         """
         if self.backend == "gemini":
-            resp = self.clients["gemini"].generate_content(prompt)
-            return resp.text
+            resp = self.clients["gemini"].generate_content(
+                prompt,
+                generation_config=genai.GenerationConfig(
+                    candidate_count=n, temperature=temperature
+                ),
+            )
+            return [
+                "".join(part.text for part in candidate.content.parts)
+                for candidate in resp.candidates
+            ]
         elif self.backend == "groq":
-            resp = self.clients["groq"].chat.completions.create(
+            # Groq's OpenAI-compatible endpoint only accepts n=1 for now
+            stream = self.clients["groq"].chat.completions.create(
                 model="llama-3.1-8b-instant",
                 messages=[{"role": "user", "content": prompt}],
+                n=1,
+                temperature=temperature,
+                stream=True,
             )
-            return resp.choices[0].message.content
+            return [self._read_until_code_closed(stream)]
         else:
             raise ValueError(f"Unknown backend: {self.backend}")
 
-    def _generate_parser_script(self, csv_content: str) -> str:
+    @staticmethod
+    def _read_until_code_closed(stream: Any) -> str:
         """
-        Generates the Python parser code using the AI model.
+        Accumulates a streamed completion, stopping once a fenced code block closes.
+
+        Everything after the closing fence is discarded by the cleanup step
+        anyway, so closing the stream early saves decoding the tail.
 
         Args:
-            csv_content: A string sample of the target CSV file.
+            stream: The streaming chat completion returned by the Groq client.
 
         Returns:
-            The raw Python code generated by the AI.
+            The text received so far.
         """
-        csv_headers = csv_content.splitlines()[0]
-        dict_keys = csv_headers.split(',')
+        buffer = ""
+        try:
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                piece = chunk.choices[0].delta.content or ""
+                buffer += piece
+                if "`" in piece and buffer.count("```") >= 2:
+                    break
+        finally:
+            stream.close()
+        return buffer
+
+    def _generate_parser_scripts(
+        self,
+        dict_keys: List[str],
+        csv_schema: str,
+        pdf_text: str,
+        pdf_layout: str,
+        n: int,
+        explore: bool = False,
+        feedback: str = "",
+    ) -> List[str]:
+        """
+        Generates candidate Python parser scripts using the AI model.
+
+        Args:
+            dict_keys: The column names of the target CSV file.
+            csv_schema: The column schema and first rows of the target CSV file.
+            pdf_text: The text extracted from the sample PDF.
+            pdf_layout: The probed table geometry of the sample PDF, if found.
+            n: The number of candidate scripts to request.
+            explore: Whether earlier attempts kept failing the same way, in
+                which case the model is pushed towards a different approach.
+            feedback: The failure summary of the previous batch, if any.
+
+        Returns:
+            The raw Python code of each candidate generated by the AI.
+        """
+        layout_section = ""
+        if pdf_layout:
+            layout_section = (
+                "\n**Table Layout (measured from the sample PDF):**\n"
+                f"{pdf_layout}\n"
+                "Assign each word to the column whose x-range contains its x0, "
+                "and group words into rows by their y coordinate.\n"
+            )
+
+        feedback_section = ""
+        if feedback:
+            feedback_section = (
+                "\n**Previous Attempt Failed:**\n"
+                f"{feedback}\n"
+                "Fix these problems in the new code.\n"
+            )
 
         prompt = f"""
 You are an expert Python developer. Your task is to write a Python script to parse a bank statement PDF.
 
 **Instructions:**
 1.  **Strictly Python Code Only:** Do not include any explanatory text, comments, or markdown formatting like ```python. Your entire output must be valid Python code.
-2.  **Function Signature:** The script must contain a function with this exact signature: `parse_pdf(pdf_path: str) -> list[dict]`
-3.  **Library:** Use the `pdfplumber` library for PDF processing.
+2.  **Function Signature:** The script must contain a function with this exact signature: `parse_pdf(pdf_path: str) -> list[dict]`. Define it exactly once.
+3.  **Library:** Use the PyMuPDF library (`import fitz`) for PDF processing. For tabular statements, read only the table region with `page.get_text("words", clip=fitz.Rect(...))` (measure the rectangle once from the sample) and group the words into rows by their y coordinate. Do not use table-detection helpers.
 4.  **Target Bank:** {self.bank_name}
 5.  **Output Format:** The function must return a list of dictionaries. Each dictionary represents a transaction.
 6.  **Dictionary Keys:** The keys for each dictionary must be exactly: {dict_keys}
 7.  **Data Extraction:** The function should extract transaction data from the text of the PDF.
 8.  **Empty Values:** If a value is not found for a key, it should be an empty string `""`.
+9.  **Vectorised Logic:** When debit/credit must be derived from balance changes, compute them with pandas `.diff()` and `numpy.where`. Never loop with `iterrows()` or assign cells one at a time with `.loc`.
+
+**Expected Output Schema:**
+{csv_schema}
 
+**PDF Text Sample:**
+{pdf_text[:PDF_SAMPLE_CHARS]}
+{layout_section}{feedback_section}
 Begin writing the code now.
 """
-        return self._get_ai_response(prompt)
+        if explore:
+            prompt += EXPLORE_INSTRUCTION
+            return self._get_ai_responses(prompt, n, EXPLORE_TEMPERATURE)
+        return self._get_ai_responses(prompt, n, CANDIDATE_TEMPERATURE)
 
     @staticmethod
-    def _clean_and_write_script(script_content: str, destination_path: Path) -> None:
+    def _clean_and_write_script(script_content: str, destination_path: Path) -> str:
         """
         Cleans the AI-generated code and writes it to a file.
 
         Args:
             script_content: The raw code from the AI.
             destination_path: The path to save the final .py file.
+
+        Returns:
+            The cleaned code that was written.
         """
-        # Remove markdown code fences
-        clean_code = script_content.replace("```python", "").replace("```", "")
+        # Keep only the first fenced code block; skip the regex entirely when
+        # the model followed the "code only" rule
+        clean_code = script_content
+        if "```" in clean_code:
+            match = _CODE_FENCE_RE.search(clean_code)
+            if match:
+                clean_code = match.group(1)
+            else:
+                clean_code = _FENCE_MARKER_RE.sub("", clean_code)
         
         # Remove null bytes and other common artifacts
         clean_code = clean_code.replace("\x00", "").replace("\ufeff", "")
@@ -144,36 +561,97 @@ Begin writing the code now.
         
         final_code = "\n".join(lines[code_start_index:]).strip()
 
-        # Ensure the parent directory exists and write the file
+        # Ensure the parent directory exists, then write via a temporary file
+        # so an importer never sees a partially written parser
         destination_path.parent.mkdir(exist_ok=True)
-        destination_path.write_text(final_code, encoding="utf-8")
+        tmp_path = destination_path.with_suffix(".py.tmp")
+        try:
+            tmp_path.write_bytes(final_code.encode("utf-8"))
+            os.replace(tmp_path, destination_path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
         print(f"✅ Wrote parser to {destination_path}")
+        return final_code
 
-    # This is the NEW, corrected method for agent.py
-    def _test_generated_parser(self) -> bool:
+    def _test_candidates(self, candidate_paths: List[Path]) -> Tuple[Optional[Path], Dict[Path, str]]:
         """
-        Runs the pytest contract test against the generated parser.
+        Runs the pytest contract test against each candidate parser in parallel.
+
+        Args:
+            candidate_paths: The candidate parser files to test.
 
         Returns:
-            True if tests pass, False otherwise.
+            A tuple of (the first candidate to pass or None, the test output of
+            each candidate that failed before then).
         """
-        print(f"🔍 Running tests for {self.bank_name}...")
-        command = [
-            sys.executable, "-m", "pytest",
-            # 👇 This line has been updated to match the new test file structure 👇
-            f"tests/test_parser_contract.py::TestParserContract::test_parser_structure_and_output[{self.bank_name}]",
-            "-v"
-        ]
-        result = subprocess.run(command, capture_output=True, text=True, check=False)
-
-        print(result.stdout)
-        if result.stderr:
-            print("--- STDERR ---")
-            print(result.stderr)
-
-        return result.returncode == 0
-
-    def _display_debug_output(self, attempt: int) -> None:
+        print(f"🔍 Running tests for {len(candidate_paths)} {self.bank_name} candidate(s)...")
+        pool = self._ensure_test_pool()
+        futures = {
+            pool.submit(run_contract_test, self.bank_name, f"{PARSERS_DIR.name}.{path.stem}"): path
+            for path in candidate_paths
+        }
+        failures: Dict[Path, str] = {}
+        try:
+            # The timeout covers the whole batch: a candidate that hangs never
+            # completes, so waiting on its result alone would block forever
+            for future in as_completed(futures, timeout=CONTRACT_TEST_TIMEOUT_SECONDS):
+                try:
+                    result = orjson.loads(future.result())
+                    passed, output = result["ok"], format_test_result(result)
+                except BrokenProcessPool as e:
+                    # A candidate took its worker down with it; start fresh next time
+                    self._shutdown_test_pool()
+                    passed, output = False, f"⚠️  Test worker crashed: {e}"
+                print(output)
+                if passed:
+                    for other in futures:
+                        other.cancel()
+                    return futures[future], failures
+                failures[futures[future]] = output
+        except FuturesTimeoutError:
+            # A running test cannot be cancelled, so the hung workers are
+            # killed and the next batch starts a fresh pool
+            self._shutdown_test_pool(terminate=True)
+            for path in futures.values():
+                if path not in failures:
+                    failures[path] = f"⚠️  Contract test timed out after {CONTRACT_TEST_TIMEOUT_SECONDS}s."
+                    print(failures[path])
+        return None, failures
+
+    def _ensure_test_pool(self) -> ProcessPoolExecutor:
+        """
+        Returns the contract test worker pool, starting it if needed.
+
+        The pool outlives a single batch so later attempts reuse warm workers.
+        Each worker pre-imports the parser stack once, and the workers are
+        started straight away so that warm-up overlaps the model call.
+        """
+        if self._test_pool is None:
+            workers = min(MAX_BATCH_SIZE, os.cpu_count() or 1)
+            self._test_pool = ProcessPoolExecutor(max_workers=workers, initializer=_prewarm_worker)
+            for _ in range(workers):
+                self._test_pool.submit(os.getpid)
+        return self._test_pool
+
+    def _shutdown_test_pool(self, terminate: bool = False) -> None:
+        """
+        Stops the contract test workers, dropping any queued tests.
+
+        Args:
+            terminate: Also kill the worker processes, for tests that are
+                still running and would otherwise never finish.
+        """
+        if self._test_pool is not None:
+            # ProcessPoolExecutor has no public kill; its worker processes are
+            # taken before shutdown() lets go of them
+            workers = list((getattr(self._test_pool, "_processes", None) or {}).values()) if terminate else []
+            self._test_pool.shutdown(wait=False, cancel_futures=True)
+            for process in workers:
+                process.terminate()
+            self._test_pool = None
+
+    def _display_debug_output(self, parser_path: Path, attempt: int) -> None:
         """Shows expected vs. generated CSV on test failure."""
         print("❌ Tests failed. Displaying output for debugging...")
         try:
@@ -184,7 +662,7 @@ Begin writing the code now.
             print("="*54 + "\n")
 
             # 2. Run generated parser and show its output
-            spec = importlib.util.spec_from_file_location(f"{self.bank_name}_parser", self.parser_path)
+            spec = importlib.util.spec_from_file_location(parser_path.stem, parser_path)
             parser_module = importlib.util.module_from_spec(spec)
             spec.loader.exec_module(parser_module)
             generated_data = parser_module.parse_pdf(self.pdf_path)
@@ -205,6 +683,95 @@ Begin writing the code now.
         except Exception as e:
             print(f"\n⚠️  Could not run generated parser for debugging: {e}")
 
+    @staticmethod
+    def _remove_candidates(candidate_paths: List[Path]) -> None:
+        """Deletes the temporary candidate parser files."""
+        for candidate_path in candidate_paths:
+            candidate_path.unlink(missing_ok=True)
+
+    def _run_attempts(self, dict_keys: List[str], csv_schema: str, pdf_text: str, pdf_layout: str) -> None:
+        """
+        Generates and tests parser candidates until one passes or attempts run out.
+
+        Args:
+            dict_keys: The column names of the target CSV file.
+            csv_schema: The column schema and first rows of the target CSV file.
+            pdf_text: The text extracted from the sample PDF.
+            pdf_layout: The probed table geometry of the sample PDF, if found.
+        """
+        # Candidates are sampled in batches of up to MAX_BATCH_SIZE and tested
+        # side by side; the model is only called again if all fail. Capping the
+        # batch keeps at least one attempt for a round that sees the failures.
+        self._ensure_test_pool()
+        attempt = 0
+        failed_digests: Set[str] = set()
+        seen_signatures: Set[str] = set()
+        explore = False
+        feedback = ""
+        while attempt < MAX_ATTEMPTS:
+            batch_size = min(MAX_BATCH_SIZE, MAX_ATTEMPTS - attempt)
+            candidates = self._generate_parser_scripts(
+                dict_keys, csv_schema, pdf_text, pdf_layout, batch_size, explore, feedback
+            )[:batch_size] or [""]
+            first, last = attempt + 1, attempt + len(candidates)
+            label = f"{first}" if first == last else f"{first}-{last}"
+            print(f"\n☂️  Attempt {label}/{MAX_ATTEMPTS} using {self.backend}...")
+
+            candidate_paths = []
+            digests: Dict[Path, str] = {}
+            rejected: Dict[Path, str] = {}
+            for number, raw_script in enumerate(candidates, start=first):
+                candidate_path = PARSERS_DIR / f"{self.bank_name}_parser_{number}.py"
+                candidate_paths.append(candidate_path)
+                code = self._clean_and_write_script(raw_script, candidate_path)
+                digest = _code_digest(code)
+                # Byte-identical code fails the same way; don't test it twice
+                if digest in failed_digests:
+                    print(f"⏭️  Candidate {number} repeats code that already failed; skipping its test.")
+                    continue
+                if digest in digests.values():
+                    print(f"⏭️  Candidate {number} duplicates another candidate in this batch; skipping its test.")
+                    continue
+                digests[candidate_path] = digest
+                # Obviously broken code is rejected without a pytest run
+                problem = check_parser_structure(code)
+                if problem:
+                    print(f"❌ Candidate {number} rejected before testing: {problem}")
+                    rejected[candidate_path] = f"❌ Rejected before testing: {problem}"
+
+            to_test = [path for path in digests if path not in rejected]
+            winner, failures = self._test_candidates(to_test) if to_test else (None, {})
+            if winner is not None:
+                os.replace(winner, self.parser_path)
+                self._remove_candidates(candidate_paths)
+                print(f"✅ Tests passed! Parser saved to {self.parser_path}.")
+                return
+
+            failures.update(rejected)
+            for number, candidate_path in enumerate(candidate_paths, start=first):
+                if candidate_path in failures:
+                    failed_digests.add(digests[candidate_path])
+                    if candidate_path not in rejected:
+                        self._display_debug_output(candidate_path, number)
+            self._remove_candidates(candidate_paths)
+
+            # If this batch only reproduced known failures, the next one is
+            # sampled hotter and asked to change approach.
+            signatures = {_failure_signature(output) for output in failures.values()}
+            explore = not (signatures - seen_signatures)
+            seen_signatures |= signatures
+
+            # The next batch sees what went wrong with this one; a batch of
+            # pure repeats keeps the previous feedback
+            if failures:
+                feedback = "\n\n".join(failures.values())[:MAX_FAILURE_CHARS]
+
+            attempt = last
+            if attempt < MAX_ATTEMPTS:
+                print("\nRetrying...\n")
+
+        print(f"🚨 Failed to generate a passing parser after {MAX_ATTEMPTS} attempts.")
+
     def run(self) -> None:
         """
         Executes the main loop to generate, write, and test the parser.
@@ -216,23 +783,16 @@ Begin writing the code now.
             print(f"  - Expected: {self.csv_path.name}")
             return
 
-        csv_content = self.csv_path.read_text(encoding="utf-8")
+        # Read the samples once; they are reused by every attempt
+        dict_keys = get_csv_header(self.csv_path)
+        csv_schema = get_csv_schema(self.csv_path)
+        pdf_text = extract_text_from_pdf(self.pdf_path, PDF_SAMPLE_CHARS)
+        pdf_layout = describe_table_layout(self.pdf_path, dict_keys)
 
-        for attempt in range(1, MAX_ATTEMPTS + 1):
-            print(f"\n☂️  Attempt {attempt}/{MAX_ATTEMPTS} using {self.backend}...")
-            
-            raw_script = self._generate_parser_script(csv_content)
-            self._clean_and_write_script(raw_script, self.parser_path)
-
-            if self._test_generated_parser():
-                print("✅ Tests passed! Parser generated successfully.")
-                return
-            else:
-                self._display_debug_output(attempt)
-                if attempt < MAX_ATTEMPTS:
-                    print("\nRetrying...\n")
-
-        print(f"🚨 Failed to generate a passing parser after {MAX_ATTEMPTS} attempts.")
+        try:
+            self._run_attempts(dict_keys, csv_schema, pdf_text, pdf_layout)
+        finally:
+            self._shutdown_test_pool()
 
 
 
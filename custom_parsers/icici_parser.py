@@ -1,39 +1,211 @@
-import pdfplumber
+import bisect
+import functools
+import hashlib
+import mmap
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
 
+import fitz  # PyMuPDF
+import numpy as np
+import orjson
+import pandas as pd
+
+COLUMNS = ['Date', 'Description', 'Debit Amt', 'Credit Amt', 'Balance']
+AMOUNT_COLUMNS = ['Debit Amt', 'Credit Amt', 'Balance']
+
+# Statement table region (header row down to the page bottom), measured once
+# from the sample PDF. Clipping to it skips the bank banner above the table.
+TABLE_CLIP = fitz.Rect(10.8, 85.0, 601.2, 792.0)
+
+# Left edges of the Description, Debit Amt, Credit Amt and Balance columns;
+# a word belongs to the column its left edge falls in.
+COLUMN_EDGES = (128.88, 246.96, 365.04, 483.12)
+
+# Statements with at least this many pages are extracted by several processes,
+# at most MAX_PAGE_WORKERS of them. The cap matters because the agent already
+# runs this parser inside its own pool of test workers.
+PARALLEL_PAGE_THRESHOLD = 16
+MAX_PAGE_WORKERS = 8
+
+# The table header row, with its column names in their fixed order
+HEADER_RE = re.compile(r'Date\s+Description\s+Debit\s+Amt\s+Credit\s+Amt\s+Balance')
+
+# One transaction row per line: the date (DD/MM/YYYY, DD-MM-YYYY, DD.MM.YY,
+# DD Mon YYYY or ISO YYYY-MM-DD), an optional description, then the amount
+# and the running balance (plain amounts such as 1935.3 or 1,20,000.00).
+_DATE = r'\d{1,2}[/\-.]\d{1,2}[/\-.]\d{2,4}|\d{1,2} +[A-Za-z]{3,9} +\d{4}|\d{4}-\d{2}-\d{2}'
+_AMOUNT = r'-?\d[\d,]*(?:\.\d+)?'
+ROW_RE = re.compile(
+    rf'^(?P<date>{_DATE}) +(?:(?P<desc>.*?) +)?(?P<amount>{_AMOUNT}) +(?P<balance>{_AMOUNT}) *$'
+)
+
+# Parsed results are cached on disk next to this file, keyed by the PDF bytes,
+# this file's source and the PyMuPDF version, so an unchanged statement is only
+# parsed once per parser and PyMuPDF version. Only the newest CACHE_MAX_ENTRIES
+# results are kept, and setting PARSER_NO_CACHE (the tests do) bypasses it.
+CACHE_DIR = Path(__file__).parent / ".cache"
+CACHE_MAX_ENTRIES = 64
+NO_CACHE_ENV = "PARSER_NO_CACHE"
+_SOURCE_KEY = hashlib.blake2b(
+    Path(__file__).read_bytes() + fitz.VersionBind.encode(), digest_size=32
+).digest()
+
+def _evict_cache() -> None:
+    entries = sorted(CACHE_DIR.glob("*.json"), key=lambda path: path.stat().st_mtime_ns)
+    for path in entries[:-CACHE_MAX_ENTRIES]:
+        path.unlink(missing_ok=True)
+
+def _cached_by_content(parse):
+    @functools.wraps(parse)
+    def wrapper(pdf_path):
+        if os.environ.get(NO_CACHE_ENV):
+            return parse(pdf_path)
+
+        # Hash straight from a read-only mapping: a cache hit never copies
+        # the PDF into Python memory, and a miss leaves it in the page cache
+        # for PyMuPDF and any extraction workers to reuse.
+        try:
+            with open(pdf_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                digest = hashlib.blake2b(mm, digest_size=16, key=_SOURCE_KEY).hexdigest()
+        except (OSError, ValueError):
+            return parse(pdf_path)
+        cache_path = CACHE_DIR / f"{digest}.json"
+        try:
+            return orjson.loads(cache_path.read_bytes())
+        except (OSError, orjson.JSONDecodeError):
+            pass
+
+        result = parse(pdf_path)
+        if result:
+            try:
+                CACHE_DIR.mkdir(exist_ok=True)
+                tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+                tmp_path.write_bytes(orjson.dumps(result))
+                os.replace(tmp_path, cache_path)
+                _evict_cache()
+            except OSError:
+                pass
+        return result
+    return wrapper
+
+def _page_rows(page) -> list[list[str]]:
+    # Rebuild each table row of the statement from PyMuPDF word boxes.
+    # Words that share a top edge belong to the same row, and each word's
+    # left edge places it in one of the COLUMNS cells.
+    rows = {}
+    for x0, y0, x1, y1, word, *_ in page.get_text("words", clip=TABLE_CLIP):
+        rows.setdefault(round(y0), []).append((x0, word))
+    table = []
+    for y in sorted(rows):
+        cells = [[] for _ in COLUMNS]
+        for x0, word in sorted(rows[y]):
+            cells[bisect.bisect_right(COLUMN_EDGES, x0)].append(word)
+        table.append([" ".join(cell) for cell in cells])
+    return table
+
+def _extract_page_range(pdf_path: str, start: int, stop: int) -> list[list[str]]:
+    # Runs in a worker process; PyMuPDF documents cannot be shared, so each
+    # worker opens its own
+    with fitz.open(pdf_path) as doc:
+        return [row for page_no in range(start, stop) for row in _page_rows(doc[page_no])]
+
+def _extract_rows(pdf_path: str) -> list[list[str]]:
+    with fitz.open(str(pdf_path)) as doc:
+        page_count = doc.page_count
+        if page_count < PARALLEL_PAGE_THRESHOLD:
+            return [row for page in doc for row in _page_rows(page)]
+
+    # Long statements are split into contiguous page ranges, one per worker
+    workers = min(MAX_PAGE_WORKERS, os.cpu_count() or 1)
+    step = -(-page_count // workers)
+    starts = list(range(0, page_count, step))
+    stops = [min(start + step, page_count) for start in starts]
+    with ProcessPoolExecutor(max_workers=len(starts)) as executor:
+        chunks = executor.map(_extract_page_range, [str(pdf_path)] * len(starts), starts, stops)
+        return [row for chunk in chunks for row in chunk]
+
+def _rows_from_cells(table: list[list[str]]) -> pd.DataFrame:
+    # Fast path for a table whose header landed in the expected columns:
+    # every cell is already in place, so rows only need filtering, and each
+    # amount is a debit or a credit by the column it sits in. Rows without a
+    # date or a balance (e.g. repeated page headers) are dropped. The table
+    # is already a list of rows, hence from_records.
+    df = pd.DataFrame.from_records(table, columns=COLUMNS)
+    return df[df['Date'].str.fullmatch(_DATE) & df['Balance'].ne('')]
+
+def _rows_from_lines(lines: list[str]) -> pd.DataFrame:
+    # One vectorised regex pass over every line after the header; lines
+    # that are not transactions (e.g. repeated page headers) come back
+    # without a date and are dropped.
+    rows = pd.Series(lines, dtype=object).str.extract(ROW_RE).dropna(subset=['date'])
+
+    # Each row carries a single amount; whether it is a debit or a credit
+    # follows from the sign of the balance change. The first row has no
+    # previous balance (and descriptions such as "Salary Credit" are not
+    # reliable in the sample), so its direction is unknown and its amount is
+    # left out of both columns, as is any row whose balance does not change
+    # or cannot be read. Only the optional description needs a fill.
+    amounts = rows['amount'].to_numpy()
+    delta = pd.to_numeric(rows['balance'].str.replace(',', '', regex=False), errors='coerce').diff()
+    is_debit = (delta < 0).to_numpy()
+    is_credit = (delta > 0).to_numpy()
+    return pd.DataFrame({
+        'Date': rows['date'].to_numpy(),
+        'Description': rows['desc'].fillna('').to_numpy(),
+        'Debit Amt': np.where(is_debit, amounts, ""),
+        'Credit Amt': np.where(is_credit, amounts, ""),
+        'Balance': rows['balance'].to_numpy(),
+    }, columns=COLUMNS)
+
+@_cached_by_content
 def parse_pdf(pdf_path: str) -> list[dict]:
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            text = ""
-            for page in pdf.pages:
-                text += page.extract_text()
-
-            lines = text.split('\n')
-            transactions = []
-            started = False
-            for line in lines:
-                line = line.strip()
-                if "Date" in line and "Description" in line and "Debit Amt" in line and "Credit Amt" in line and "Balance" in line:
-                    started = True
-                    continue
-                if started and line:
-                    parts = line.split()
-                    if len(parts) >= 5:
-                        date_str = " ".join(parts[:2])
-                        description = " ".join(parts[2:-3])
-                        debit = parts[-3] if parts[-3].replace(".","").isdigit() else ""
-                        credit = parts[-2] if parts[-2].replace(".","").isdigit() else ""
-                        balance = parts[-1]
-                        transactions.append({
-                            'Date': date_str,
-                            'Description': description,
-                            'Debit Amt': debit,
-                            'Credit Amt': credit,
-                            'Balance': balance
-                        })
-
-            return transactions
+        table = _extract_rows(pdf_path)
+        for index, cells in enumerate(table):
+            if HEADER_RE.search(" ".join(cells)):
+                break
+        else:
+            return []
+
+        # If the header's words did not split into the expected columns, the
+        # layout differs from the sample; fall back to the line regex, which
+        # only relies on the order of the fields.
+        if table[index] == COLUMNS:
+            df = _rows_from_cells(table[index + 1:])
+        else:
+            df = _rows_from_lines([" ".join(filter(None, cells)) for cells in table[index + 1:]])
+
+        return df.to_dict('records')
     except FileNotFoundError:
         return []
     except Exception as e:
         print(f"An error occurred: {e}")
-        return []
\ No newline at end of file
+        return []
+
+# Date formats for parse_frame. ISO dates are read year first; every other
+# form _DATE accepts is day first, with its separator normalised to '-'.
+ISO_DATE_FORMAT = '%Y-%m-%d'
+DAY_FIRST_FORMATS = ('%d-%m-%Y', '%d-%m-%y', '%d %b %Y', '%d %B %Y')
+
+def _parse_dates(dates: pd.Series) -> pd.Series:
+    dates = dates.astype(str).str.strip()
+    iso = dates.str.fullmatch(r'\d{4}-\d{2}-\d{2}')
+    parsed = pd.to_datetime(dates.where(iso), format=ISO_DATE_FORMAT, errors='coerce')
+    day_first = dates.where(~iso).str.replace(r'[/.]', '-', regex=True).str.replace(r' +', ' ', regex=True)
+    for date_format in DAY_FIRST_FORMATS:
+        parsed = parsed.fillna(pd.to_datetime(day_first, format=date_format, errors='coerce'))
+    return parsed
+
+def parse_frame(pdf_path: str) -> pd.DataFrame:
+    # Typed view of parse_pdf for numeric work: dates become datetime64 and
+    # amounts nullable Float64, with <NA> where parse_pdf has "". Float64
+    # rather than Float32, which cannot hold balances above ~1.3 lakh to the paisa.
+    # A date that matches none of the formats above becomes NaT.
+    df = pd.DataFrame(parse_pdf(pdf_path), columns=COLUMNS)
+    for column in AMOUNT_COLUMNS:
+        cleaned = df[column].astype(str).str.replace(',', '', regex=False)
+        df[column] = pd.to_numeric(cleaned, errors='coerce').astype('Float64')
+    df['Date'] = _parse_dates(df['Date'])
+    return df
@@ -0,0 +1,35 @@
+"""
+Shared configuration for the parser test suites: locating the sample data
+and discovering which banks have samples to test against.
+"""
+
+import functools
+import pathlib
+import pytest
+
+# Define the root directory for test data samples.
+SAMPLES_ROOT_DIR = pathlib.Path("data")
+
+@functools.lru_cache(maxsize=1)
+def find_available_parsers():
+    """Dynamically finds all available bank parsers based on folder names in the data directory."""
+    # Cached so the data directory is walked once per process, however many
+    # test modules parametrize over it or pytest sessions the agent runs.
+    if not SAMPLES_ROOT_DIR.is_dir():
+        return ()
+    return tuple(p.name for p in SAMPLES_ROOT_DIR.iterdir() if p.is_dir())
+
+@pytest.fixture(scope="session")
+def samples_root_dir():
+    """A pytest fixture to provide the root directory of the sample data."""
+    return SAMPLES_ROOT_DIR
+
+@pytest.fixture(scope="module", params=find_available_parsers())
+def bank_identifier(request):
+    """A pytest fixture to provide each bank identifier to the test class."""
+    return request.param
+
+@pytest.fixture(autouse=True)
+def no_parser_cache(monkeypatch):
+    """A pytest fixture that makes parsers extract every statement rather than replay a cached result."""
+    monkeypatch.setenv("PARSER_NO_CACHE", "1")
@@ -0,0 +1,119 @@
+# tests/test_agent_attempts.py
+"""
+Tests for the agent's generate-and-test loop and its contract test pool,
+with the model and the worker processes replaced by stubs.
+"""
+
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+import agent
+
+PARSER_CODE = "def parse_pdf(pdf_path):\n    return {rows}\n"
+
+
+@pytest.fixture
+def parser_agent(tmp_path, monkeypatch):
+    """A gemini-backed agent that writes its candidates under tmp_path."""
+    monkeypatch.setattr(agent, "initialize_clients", lambda: {})
+    monkeypatch.setattr(agent, "PARSERS_DIR", tmp_path / "custom_parsers")
+    parser_agent = agent.ParserAgent(bank_name="icici", preferred_backend="gemini")
+    monkeypatch.setattr(parser_agent, "_ensure_test_pool", lambda: None)
+    monkeypatch.setattr(parser_agent, "_display_debug_output", lambda parser_path, attempt: None)
+    return parser_agent
+
+
+class TestRunAttempts:
+    """
+    Validates how candidates are batched and how failures feed the next round.
+    """
+
+    def test_failed_batch_is_followed_by_a_feedback_round(self, parser_agent, monkeypatch):
+        calls = []
+
+        def fake_responses(prompt, n, temperature):
+            calls.append((prompt, n))
+            return [PARSER_CODE.format(rows=f"[{{'call': {len(calls)}, 'n': {i}}}]") for i in range(n)]
+
+        def fake_test_candidates(candidate_paths):
+            if len(calls) == 1:
+                return None, {path: "❌ KeyError: 'Balance'" for path in candidate_paths}
+            return candidate_paths[0], {}
+
+        monkeypatch.setattr(parser_agent, "_get_ai_responses", fake_responses)
+        monkeypatch.setattr(parser_agent, "_test_candidates", fake_test_candidates)
+
+        parser_agent._run_attempts(["Date", "Balance"], "- Date: text", "", "")
+
+        assert [n for _, n in calls] == [agent.MAX_BATCH_SIZE, agent.MAX_ATTEMPTS - agent.MAX_BATCH_SIZE]
+        assert "Previous Attempt Failed" not in calls[0][0]
+        assert "KeyError: 'Balance'" in calls[1][0]
+        assert parser_agent.parser_path.exists()
+
+    def test_gives_up_after_max_attempts(self, parser_agent, monkeypatch):
+        calls = []
+
+        def fake_responses(prompt, n, temperature):
+            calls.append(n)
+            return [PARSER_CODE.format(rows=f"[{len(calls)}, {i}]") for i in range(n)]
+
+        monkeypatch.setattr(parser_agent, "_get_ai_responses", fake_responses)
+        monkeypatch.setattr(
+            parser_agent, "_test_candidates",
+            lambda candidate_paths: (None, {path: "❌ no rows" for path in candidate_paths}),
+        )
+
+        parser_agent._run_attempts(["Date", "Balance"], "- Date: text", "", "")
+
+        assert sum(calls) == agent.MAX_ATTEMPTS
+        assert len(calls) > 1
+        assert not parser_agent.parser_path.exists()
+
+
+class FakePool:
+    """A stand-in executor whose futures are completed by the test."""
+
+    def __init__(self, outcome):
+        self.outcome = outcome
+        self.shut_down = False
+
+    def submit(self, fn, *args):
+        future = Future()
+        self.outcome(future)
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+
+class TestTestCandidates:
+    """
+    Validates how crashed and hung contract test workers are handled.
+    """
+
+    def test_hung_candidate_times_out_as_a_failure(self, parser_agent, tmp_path, monkeypatch):
+        pool = FakePool(lambda future: None)  # never completes
+        parser_agent._test_pool = pool
+        monkeypatch.setattr(parser_agent, "_ensure_test_pool", lambda: pool)
+        monkeypatch.setattr(agent, "CONTRACT_TEST_TIMEOUT_SECONDS", 0.01)
+        path = tmp_path / "icici_parser_1.py"
+
+        winner, failures = parser_agent._test_candidates([path])
+
+        assert winner is None
+        assert "timed out" in failures[path]
+        assert pool.shut_down and parser_agent._test_pool is None
+
+    def test_broken_pool_is_shut_down(self, parser_agent, tmp_path, monkeypatch):
+        pool = FakePool(lambda future: future.set_exception(BrokenProcessPool("worker died")))
+        parser_agent._test_pool = pool
+        monkeypatch.setattr(parser_agent, "_ensure_test_pool", lambda: pool)
+        path = tmp_path / "icici_parser_1.py"
+
+        winner, failures = parser_agent._test_candidates([path])
+
+        assert winner is None
+        assert "crashed" in failures[path]
+        assert pool.shut_down and parser_agent._test_pool is None
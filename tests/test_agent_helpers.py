@@ -0,0 +1,276 @@
+# tests/test_agent_helpers.py
+"""
+Unit tests for the pure helper functions the agent uses to prepare prompts
+and to triage generated parser candidates.
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+import agent
+
+
+class TestCheckParserStructure:
+    """
+    Validates the cheap structural check run before a candidate is tested.
+    """
+
+    @pytest.mark.parametrize("code", [
+        "def parse_pdf(pdf_path):\n    return []\n",
+        "def parse_pdf(pdf_path: str, strict: bool = False) -> list[dict]:\n    return []\n",
+        "def parse_pdf(*args):\n    return []\n",
+        "def parse_pdf(pdf_path, *, strict=False):\n    return []\n",
+    ])
+    def test_accepts_single_argument_parsers(self, code):
+        assert agent.check_parser_structure(code) is None
+
+    def test_reports_syntax_error(self):
+        problem = agent.check_parser_structure("def parse_pdf(pdf_path:\n    return []\n")
+        assert problem.startswith("SyntaxError")
+
+    def test_reports_missing_parse_pdf(self):
+        problem = agent.check_parser_structure("def parse(pdf_path):\n    return []\n")
+        assert problem == "no top-level parse_pdf function defined"
+
+    def test_ignores_nested_parse_pdf(self):
+        code = "class Parser:\n    def parse_pdf(self, pdf_path):\n        return []\n"
+        assert agent.check_parser_structure(code) == "no top-level parse_pdf function defined"
+
+    def test_reports_duplicate_parse_pdf(self):
+        code = (
+            "def parse_pdf(pdf_path):\n    return []\n\n"
+            "def parse_pdf(pdf_path):\n    return [{}]\n"
+        )
+        assert "defined 2 times" in agent.check_parser_structure(code)
+
+    @pytest.mark.parametrize("code", [
+        "def parse_pdf():\n    return []\n",
+        "def parse_pdf(pdf_path, csv_path):\n    return []\n",
+        "def parse_pdf(pdf_path, *, mode):\n    return []\n",
+    ])
+    def test_reports_unusable_signature(self, code):
+        problem = agent.check_parser_structure(code)
+        assert problem == "parse_pdf must be callable with a single pdf_path argument"
+
+
+class TestGetCsvSchema:
+    """
+    Validates the column summary sent to the model as the expected output.
+    """
+
+    def test_describes_each_column_and_keeps_the_sample_rows(self, tmp_path):
+        csv_path = tmp_path / "bank_sample.csv"
+        csv_path.write_text(
+            "Date,Description,Debit Amt,Credit Amt,Balance\n"
+            "01-08-2024,Salary Credit,,1935.3,6864.58\n"
+            '02-08-2024,Rent,500,,"6,364.58"\n',
+            encoding="utf-8",
+        )
+
+        schema = agent.get_csv_schema(csv_path)
+
+        assert schema.splitlines()[:5] == [
+            "- Date: text",
+            "- Description: text",
+            "- Debit Amt: number, sometimes empty",
+            "- Credit Amt: number, sometimes empty",
+            "- Balance: number",
+        ]
+        assert schema.endswith("First rows:\n" + csv_path.read_text(encoding="utf-8").strip())
+
+    def test_flags_columns_empty_in_every_sample_row(self, tmp_path):
+        csv_path = tmp_path / "bank_sample.csv"
+        csv_path.write_text("Date,Notes\n01-08-2024,\n02-08-2024,\n", encoding="utf-8")
+
+        assert "- Notes: empty in the sample rows" in agent.get_csv_schema(csv_path)
+
+    def test_reads_only_the_first_sample_rows(self, tmp_path):
+        csv_path = tmp_path / "bank_sample.csv"
+        rows = [f"0{day}-08-2024,Row {day}" for day in range(1, agent.CSV_SAMPLE_ROWS + 3)]
+        csv_path.write_text("\n".join(["Date,Description", *rows]) + "\n", encoding="utf-8")
+
+        schema = agent.get_csv_schema(csv_path)
+
+        assert rows[agent.CSV_SAMPLE_ROWS - 1] in schema
+        assert rows[agent.CSV_SAMPLE_ROWS] not in schema
+
+
+class TestFailureSignature:
+    """
+    Validates that failure signatures ignore details that vary between runs.
+    """
+
+    def test_ignores_durations_candidate_numbers_and_temp_dirs(self):
+        first = (
+            "E   ModuleNotFoundError in custom_parsers.icici_parser_1 "
+            "(/tmp/pytest-of-agent/pytest-12/test0) failed in 0.42s"
+        )
+        second = (
+            "E   ModuleNotFoundError in custom_parsers.icici_parser_3 "
+            "(/tmp/pytest-of-agent/pytest-13/test0) failed in 1.7s"
+        )
+        assert agent._failure_signature(first) == agent._failure_signature(second)
+
+    def test_distinguishes_different_failures(self):
+        assert agent._failure_signature("E   KeyError: 'Balance'") != \
+            agent._failure_signature("E   KeyError: 'Date'")
+
+
+class FakeStream:
+    """A stand-in for a streamed Groq chat completion."""
+
+    def __init__(self, pieces):
+        self.pieces = pieces
+        self.consumed = 0
+        self.closed = False
+
+    def __iter__(self):
+        for piece in self.pieces:
+            self.consumed += 1
+            if isinstance(piece, Exception):
+                raise piece
+            choices = [] if piece is None else [SimpleNamespace(delta=SimpleNamespace(content=piece))]
+            yield SimpleNamespace(choices=choices)
+
+    def close(self):
+        self.closed = True
+
+
+class TestReadUntilCodeClosed:
+    """
+    Validates that a streamed completion is cut off once its code block closes.
+    """
+
+    def test_stops_after_the_closing_fence(self):
+        stream = FakeStream(["```python\n", "def parse_pdf(p):\n", "    return []\n```", "\nExplanation", " follows."])
+
+        text = agent.ParserAgent._read_until_code_closed(stream)
+
+        assert text == "```python\ndef parse_pdf(p):\n    return []\n```"
+        assert stream.consumed == 3
+        assert stream.closed
+
+    def test_skips_chunks_without_content(self):
+        stream = FakeStream([None, "import fitz\n", "", "def parse_pdf(p):\n    return []\n"])
+
+        text = agent.ParserAgent._read_until_code_closed(stream)
+
+        assert text == "import fitz\ndef parse_pdf(p):\n    return []\n"
+        assert stream.closed
+
+    def test_closes_the_stream_on_error(self):
+        stream = FakeStream(["```python\n", ConnectionError("reset")])
+
+        with pytest.raises(ConnectionError):
+            agent.ParserAgent._read_until_code_closed(stream)
+        assert stream.closed
+
+
+class TestLocateColumns:
+    """
+    Validates how column names are found among the words of a header row.
+    """
+
+    COLUMNS = ("Date", "Description", "Debit Amt", "Credit Amt", "Balance")
+    HEADER = [
+        (61.5, 78.0, "Date"), (168.0, 206.0, "Description"),
+        (288.3, 308.0, "Debit"), (310.0, 323.7, "Amt"),
+        (405.2, 426.0, "Credit"), (428.0, 441.7, "Amt"),
+        (528.2, 555.0, "Balance"),
+    ]
+
+    def test_returns_the_extent_of_each_column_name(self):
+        assert agent._locate_columns(self.HEADER, self.COLUMNS) == [
+            (61.5, 78.0), (168.0, 206.0), (288.3, 323.7), (405.2, 441.7), (528.2, 555.0),
+        ]
+
+    def test_skips_words_before_the_header(self):
+        row = [(5.0, 40.0, "Statement")] + self.HEADER
+        assert agent._locate_columns(row, self.COLUMNS)[0] == (61.5, 78.0)
+
+    def test_returns_none_when_a_column_is_missing(self):
+        assert agent._locate_columns(self.HEADER[:-1], self.COLUMNS) is None
+
+    def test_returns_none_when_columns_are_out_of_order(self):
+        assert agent._locate_columns(self.HEADER, ("Balance", "Date")) is None
+
+
+class TestCleanAndWriteScript:
+    """
+    Validates how model output is turned into a parser file.
+    """
+
+    @pytest.mark.parametrize("fence", ["```python", "```py", "```Python", "```python3", "```"])
+    def test_strips_any_code_fence(self, tmp_path, fence):
+        raw = f"Here is the parser:\n{fence}\nimport fitz\n\ndef parse_pdf(pdf_path):\n    return []\n```\nDone."
+        destination = tmp_path / "bank_parser.py"
+
+        code = agent.ParserAgent._clean_and_write_script(raw, destination)
+
+        assert code == "import fitz\n\ndef parse_pdf(pdf_path):\n    return []"
+        assert destination.read_text(encoding="utf-8") == code
+
+    def test_strips_an_unclosed_fence(self, tmp_path):
+        raw = "```py\ndef parse_pdf(pdf_path):\n    return []\n"
+
+        code = agent.ParserAgent._clean_and_write_script(raw, tmp_path / "bank_parser.py")
+
+        assert code == "def parse_pdf(pdf_path):\n    return []"
+
+    def test_removes_the_temporary_file_when_the_write_fails(self, tmp_path, monkeypatch):
+        def failing_replace(src, dst):
+            raise PermissionError("destination is locked")
+
+        monkeypatch.setattr(agent.os, "replace", failing_replace)
+
+        with pytest.raises(PermissionError):
+            agent.ParserAgent._clean_and_write_script("def parse_pdf(p):\n    return []\n", tmp_path / "bank_parser.py")
+        assert list(tmp_path.iterdir()) == []
+
+
+class TestFailureCollector:
+    """
+    Validates the failure summary that is shown and fed back to the model.
+    """
+
+    @staticmethod
+    def failed_report(longreprtext, sections=(), when="call"):
+        return SimpleNamespace(
+            failed=True,
+            when=when,
+            nodeid="tests/test_parser_contract.py::TestParserContract::test_parser_structure_and_output[icici]",
+            longreprtext=longreprtext,
+            sections=list(sections),
+        )
+
+    def test_keeps_the_captured_output_of_a_failure(self):
+        collector = agent._FailureCollector()
+        collector.pytest_runtest_logreport(self.failed_report(
+            "AssertionError: The parser must extract at least one row of data.",
+            [("Captured stdout call", "An error occurred: 'Balance'\n")],
+        ))
+
+        failure, = collector.failures
+        assert failure["output"] == "An error occurred: 'Balance'\n"
+        report = agent.format_test_result({"ok": False, "exit_code": 1, "failures": collector.failures})
+        assert "at least one row" in report
+        assert "An error occurred: 'Balance'" in report
+
+    def test_keeps_each_failure_within_the_size_budget(self):
+        collector = agent._FailureCollector()
+        collector.pytest_collectreport(self.failed_report(
+            "E" * (2 * agent.MAX_FAILURE_CHARS),
+            [("Captured stderr", "W" * (2 * agent.MAX_FAILURE_CHARS))],
+        ))
+
+        failure, = collector.failures
+        assert failure["when"] == "collect"
+        assert len(failure["message"]) + len(failure["output"]) <= agent.MAX_FAILURE_CHARS
+        assert failure["output"]
+
+    def test_ignores_passing_reports(self):
+        collector = agent._FailureCollector()
+        collector.pytest_runtest_logreport(SimpleNamespace(failed=False, when="call"))
+
+        assert collector.failures == []
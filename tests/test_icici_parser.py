@@ -0,0 +1,150 @@
+# tests/test_icici_parser.py
+"""
+Unit tests for the internals of the hand-written ICICI parser: its on-disk
+result cache, multi-process extraction, line-based fallback and typed view.
+"""
+
+import fitz  # PyMuPDF
+import pytest
+
+from custom_parsers import icici_parser
+
+
+class TestContentCache:
+    """
+    Validates the on-disk cache of parse results keyed by statement content.
+    """
+
+    @staticmethod
+    def counting_parser(calls):
+        @icici_parser._cached_by_content
+        def parse(pdf_path):
+            calls.append(pdf_path)
+            return [{"Date": "01-08-2024", "Balance": "6864.58"}]
+        return parse
+
+    def test_reuses_the_result_for_unchanged_content(self, tmp_path, monkeypatch):
+        monkeypatch.delenv(icici_parser.NO_CACHE_ENV)
+        monkeypatch.setattr(icici_parser, "CACHE_DIR", tmp_path / "cache")
+        calls = []
+        parse = self.counting_parser(calls)
+        statement = tmp_path / "statement.pdf"
+        statement.write_bytes(b"%PDF-1.4 first statement")
+
+        assert parse(statement) == parse(statement) == [{"Date": "01-08-2024", "Balance": "6864.58"}]
+        assert calls == [statement]
+
+        statement.write_bytes(b"%PDF-1.4 edited statement")
+        parse(statement)
+        assert len(calls) == 2
+
+    def test_keeps_only_the_newest_entries(self, tmp_path, monkeypatch):
+        monkeypatch.delenv(icici_parser.NO_CACHE_ENV)
+        monkeypatch.setattr(icici_parser, "CACHE_DIR", tmp_path / "cache")
+        monkeypatch.setattr(icici_parser, "CACHE_MAX_ENTRIES", 2)
+        parse = self.counting_parser([])
+        for number in range(3):
+            statement = tmp_path / f"statement_{number}.pdf"
+            statement.write_bytes(f"%PDF-1.4 statement {number}".encode())
+            parse(statement)
+
+        assert len(list((tmp_path / "cache").glob("*.json"))) == 2
+
+    def test_is_bypassed_when_disabled(self, tmp_path, monkeypatch):
+        # The autouse no_parser_cache fixture sets PARSER_NO_CACHE
+        monkeypatch.setattr(icici_parser, "CACHE_DIR", tmp_path / "cache")
+        calls = []
+        parse = self.counting_parser(calls)
+        statement = tmp_path / "statement.pdf"
+        statement.write_bytes(b"%PDF-1.4 statement")
+
+        parse(statement)
+        parse(statement)
+
+        assert len(calls) == 2
+        assert not (tmp_path / "cache").exists()
+
+
+@pytest.fixture
+def long_statement(tmp_path):
+    """A synthetic 17-page statement with a numbered table row per line."""
+    pdf_path = tmp_path / "long_statement.pdf"
+    with fitz.open() as doc:
+        for page_no in range(17):
+            page = doc.new_page(width=612, height=792)
+            for line in range(5):
+                y = 100 + 14 * line
+                page.insert_text((50, y), f"{line + 1:02d}-08-2024", fontsize=7)
+                page.insert_text((145, y), f"Page {page_no} row {line}", fontsize=7)
+                page.insert_text((410, y), f"{page_no}.{line}", fontsize=7)
+                page.insert_text((528, y), f"{1000 + page_no * 10 + line}.0", fontsize=7)
+        doc.save(pdf_path)
+    return pdf_path
+
+
+class TestExtractRows:
+    """
+    Validates that multi-process extraction matches a single serial pass.
+    """
+
+    def test_parallel_extraction_matches_the_serial_path(self, long_statement, monkeypatch):
+        # Three workers over 17 pages gives uneven ranges of 6, 6 and 5 pages
+        monkeypatch.setattr(icici_parser.os, "cpu_count", lambda: 3)
+        parallel = icici_parser._extract_rows(str(long_statement))
+
+        monkeypatch.setattr(icici_parser, "PARALLEL_PAGE_THRESHOLD", 10**6)
+        serial = icici_parser._extract_rows(str(long_statement))
+
+        assert len(serial) == 17 * 5
+        assert serial[0] == ["01-08-2024", "Page 0 row 0", "", "0.0", "1000.0"]
+        assert serial[-1][1] == "Page 16 row 4"
+        assert parallel == serial
+
+
+class TestParseFrame:
+    """
+    Validates the dates and amounts of the typed view of parse_pdf.
+    """
+
+    @staticmethod
+    def record(date):
+        return {"Date": date, "Description": "", "Debit Amt": "", "Credit Amt": "1,935.30", "Balance": "6864.58"}
+
+    def test_reads_iso_dates_year_first_and_the_rest_day_first(self, monkeypatch):
+        dates = ["2024-01-05", "05/01/2024", "05-01-2024", "5.1.24", "05 Jan 2024", "5 January 2024", "31/02/2024"]
+        monkeypatch.setattr(icici_parser, "parse_pdf", lambda pdf_path: [self.record(date) for date in dates])
+
+        df = icici_parser.parse_frame("statement.pdf")
+
+        assert [str(date.date()) for date in df["Date"][:-1]] == ["2024-01-05"] * (len(dates) - 1)
+        assert df["Date"].isna().tolist() == [False] * (len(dates) - 1) + [True]
+        assert df["Credit Amt"].tolist() == [1935.3] * len(dates)
+        assert df["Debit Amt"].isna().all()
+
+
+class TestRowsFromLines:
+    """
+    Validates the line regex fallback used when the header is not in the expected columns.
+    """
+
+    LINES = [
+        "01-08-2024 Salary Credit XYZ Pvt Ltd 1935.3 6864.58",
+        "Page 2 of 5",
+        "2024-08-02 Rent 500 6,364.58",
+        "03/08/2024 1,000.00 7,364.58",
+    ]
+
+    def test_splits_amounts_by_the_balance_change(self):
+        df = icici_parser._rows_from_lines(self.LINES)
+
+        assert list(df.columns) == icici_parser.COLUMNS
+        assert df.values.tolist() == [
+            ["01-08-2024", "Salary Credit XYZ Pvt Ltd", "", "", "6864.58"],
+            ["2024-08-02", "Rent", "500", "", "6,364.58"],
+            ["03/08/2024", "", "", "1,000.00", "7,364.58"],
+        ]
+
+    def test_leaves_the_first_row_direction_unknown(self):
+        df = icici_parser._rows_from_lines(["05 Aug 2024 ATM Withdrawal 200 9800"])
+
+        assert df[["Debit Amt", "Credit Amt"]].values.tolist() == [["", ""]]
@@ -6,52 +6,44 @@ contract, ensuring they are correctly implemented and produce valid output.
 
 import csv
 import importlib
-import pathlib
+import os
+import pandas as pd
 import pytest
 
-# Define the root directory for test data samples.
-SAMPLES_ROOT_DIR = pathlib.Path("data")
-
-def find_available_parsers():
-    """Dynamically finds all available bank parsers based on folder names in the data directory."""
-    if not SAMPLES_ROOT_DIR.is_dir():
-        return []
-    return [p.name for p in SAMPLES_ROOT_DIR.iterdir() if p.is_dir()]
-
-@pytest.fixture(scope="module", params=find_available_parsers())
-def bank_identifier(request):
-    """A pytest fixture to provide each bank identifier to the test class."""
-    return request.param
-
+@pytest.fixture(scope="module")
+def parser_module(bank_identifier):
+    """A pytest fixture that imports each bank's parser module once."""
+    # The agent sets PARSER_MODULE to test a candidate parser under its own
+    # module name. It is read when the fixture runs, not at import, because
+    # the agent reuses this module across in-process pytest sessions.
+    module_name = os.environ.get("PARSER_MODULE") or f"custom_parsers.{bank_identifier}_parser"
+    try:
+        return importlib.import_module(module_name)
+    except ImportError:
+        pytest.fail(f"Could not import the parser module: '{module_name}.py'")
 
 class TestParserContract:
     """
     Validates the contract for each bank-specific parser.
     """
 
-    def test_parser_structure_and_output(self, bank_identifier):
+    def test_parser_structure_and_output(self, samples_root_dir, bank_identifier, parser_module, tmp_path):
         """
         For each bank, this test ensures:
         1. The parser module exists and can be imported.
         2. It contains a callable 'parse_pdf' function.
         3. The function returns a non-empty list of dictionaries.
-        4. The output is successfully written back to the sample CSV file.
+        4. The output can be written out as CSV, leaving the sample CSV
+           untouched as the ground truth.
+        5. The written output matches the sample CSV row for row.
         """
         # --- 1. Module and Function Validation ---
-        try:
-            module_name = f"custom_parsers.{bank_identifier}_parser"
-            parser_module = importlib.import_module(module_name)
-        except ImportError:
-            pytest.fail(f"Could not import the parser module: '{module_name}.py'")
-
-        assert hasattr(parser_module, "parse_pdf"), \
-            f"The parser '{module_name}.py' must have a 'parse_pdf' function."
-        
-        parse_function = getattr(parser_module, "parse_pdf")
-        assert callable(parse_function), "'parse_pdf' must be a callable function."
+        parse_function = getattr(parser_module, "parse_pdf", None)
+        assert callable(parse_function), \
+            f"The parser '{parser_module.__name__}.py' must have a callable 'parse_pdf' function."
 
         # --- 2. Execution and Data Validation ---
-        pdf_sample_path = SAMPLES_ROOT_DIR / bank_identifier / f"{bank_identifier}_sample.pdf"
+        pdf_sample_path = samples_root_dir / bank_identifier / f"{bank_identifier}_sample.pdf"
         
         # Run the parser on the sample PDF
         parsed_data = parse_function(pdf_sample_path)
@@ -63,8 +55,10 @@ class TestParserContract:
             "All items in the returned list must be dictionaries."
 
         # --- 3. CSV Writing and Validation ---
-        output_csv_path = SAMPLES_ROOT_DIR / bank_identifier / f"{bank_identifier}_sample.csv"
-        
+        # Output goes to a per-test directory: the sample CSV is the ground
+        # truth, and concurrent agent candidates must not share a file.
+        output_csv_path = tmp_path / f"{bank_identifier}_output.csv"
+
         try:
             # Get the headers from the first data row
             headers = parsed_data[0].keys()
@@ -77,4 +71,40 @@ class TestParserContract:
         
         # Final check to ensure the file was written and is not empty
         assert output_csv_path.exists(), f"Output CSV file was not created at: {output_csv_path}"
-        assert output_csv_path.stat().st_size > 0, "The generated CSV file is empty."
\ No newline at end of file
+        assert output_csv_path.stat().st_size > 0, "The generated CSV file is empty."
+
+        # --- 4. Comparison with the Ground Truth ---
+        # Both sides go through read_csv so they are typed the same way; on a
+        # mismatch pandas reports the first differing column and rows.
+        expected_csv_path = samples_root_dir / bank_identifier / f"{bank_identifier}_sample.csv"
+        pd.testing.assert_frame_equal(
+            pd.read_csv(output_csv_path),
+            pd.read_csv(expected_csv_path),
+            check_dtype=False,
+            check_like=True,
+        )
+
+    def test_parse_frame_types(self, samples_root_dir, bank_identifier, parser_module):
+        """
+        For parsers that also offer a typed parse_frame view, this test ensures:
+        1. It has one row per record returned by parse_pdf.
+        2. Dates are datetime64, with every sample date understood.
+        3. Amount columns are nullable Float64, <NA> exactly where parse_pdf has "".
+        """
+        parse_frame = getattr(parser_module, "parse_frame", None)
+        if parse_frame is None:
+            pytest.skip(f"The parser '{parser_module.__name__}.py' has no 'parse_frame' view.")
+
+        pdf_sample_path = samples_root_dir / bank_identifier / f"{bank_identifier}_sample.pdf"
+        records = parser_module.parse_pdf(pdf_sample_path)
+        frame = parse_frame(pdf_sample_path)
+
+        assert len(frame) == len(records), "parse_frame must return one row per parse_pdf record."
+        assert pd.api.types.is_datetime64_any_dtype(frame["Date"]), "'Date' must be datetime64."
+        assert not frame["Date"].isna().any(), "Every sample date must parse."
+
+        for column in frame.columns.drop(["Date", "Description"]):
+            assert frame[column].dtype == "Float64", f"'{column}' must be nullable Float64."
+            blanks = [record[column] == "" for record in records]
+            assert frame[column].isna().tolist() == blanks, \
+                f"'{column}' must be <NA> exactly where parse_pdf returns an empty string."